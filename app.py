@@ -1,19 +1,10 @@
 """
 Main application entry point for Quant Analytics.
 """
-import uvicorn
-import subprocess
 import sys
 from pathlib import Path
 
-def check_api_running():
-    """Check if API is already running."""
-    try:
-        import requests
-        response = requests.get("http://localhost:8000/")
-        return response.status_code == 200
-    except:
-        return False
+from src.backend.server import is_api_running, start_api_thread
 
 def main():
     """Run the application."""
@@ -23,34 +14,14 @@ def main():
     print()
     
     # Check if API is running
-    if not check_api_running():
+    if not is_api_running():
         print("Starting FastAPI backend...")
-        # Start API in background
-        import threading
-        def run_api():
-            uvicorn.run(
-                "src.backend.api:app",
-                host="127.0.0.1",
-                port=8000,
-                log_level="info"
-            )
-        
-        api_thread = threading.Thread(target=run_api, daemon=True)
-        api_thread.start()
-        
-        # Wait for API to start
-        import time
-        max_wait = 10
-        for i in range(max_wait):
-            time.sleep(1)
-            if check_api_running():
-                print("✓ API started successfully")
-                break
-            print(f"Waiting for API... ({i+1}/{max_wait})")
-        
-        if not check_api_running():
+        # Start API in background and wait for it to start listening
+        print("Waiting for API...")
+        if not start_api_thread(timeout=10):
             print("✗ Failed to start API")
             sys.exit(1)
+        print("✓ API started successfully")
     else:
         print("✓ API already running")
     
@@ -4,16 +4,8 @@ Run with: python run.py
 """
 import subprocess
 import sys
-import time
-import signal
-import requests
 
-def check_api():
-    """Check if API is running."""
-    try:
-        return requests.get("http://localhost:8000/").status_code == 200
-    except:
-        return False
+from src.backend.server import is_api_running, start_api_thread
 
 def main():
     print("=" * 60)
@@ -21,33 +13,12 @@ def main():
     print("=" * 60)
     
     # Import and start API
-    if not check_api():
+    if not is_api_running():
         print("\n[1/3] Starting FastAPI backend on http://localhost:8000...")
-        import threading
-        import uvicorn
-        
-        def run_api():
-            uvicorn.run(
-                "src.backend.api:app",
-                host="127.0.0.1",
-                port=8000,
-                log_level="info"
-            )
-        
-        api_thread = threading.Thread(target=run_api, daemon=True)
-        api_thread.start()
-        
-        # Wait for API
-        for i in range(15):
-            time.sleep(1)
-            if check_api():
-                print("[OK] Backend started successfully")
-                break
-            if i == 14:
-                print("[ERROR] Backend failed to start")
-                return
-        
-        time.sleep(1)
+        if not start_api_thread(timeout=15):
+            print("[ERROR] Backend failed to start")
+            return
+        print("[OK] Backend started successfully")
     
     print("\n[2/3] Backend running on http://localhost:8000")
     print("[3/3] Starting Streamlit frontend...")
@@ -16,6 +16,56 @@ logger = logging.getLogger(__name__)
 class AnalyticsEngine:
     """Analytics engine for computing trading indicators and statistics."""
     
+    @staticmethod
+    def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+        """Sum of every length-window slice of values, via one cumulative sum (O(n))."""
+        csum = np.concatenate(([0.0], np.cumsum(values)))
+        return csum[window:] - csum[:-window]
+    
+    @staticmethod
+    def _align_finite(series1: pd.Series, series2: pd.Series) -> Tuple[pd.Index, np.ndarray, np.ndarray]:
+        """Inner-join two series on their index, keeping rows where both values are finite."""
+        series1, series2 = series1.align(series2, join='inner')
+        values1 = series1.to_numpy(dtype=np.float64)
+        values2 = series2.to_numpy(dtype=np.float64)
+        mask = np.isfinite(values1) & np.isfinite(values2)
+        return series1.index[mask], values1[mask], values2[mask]
+    
+    @staticmethod
+    def _rolling_mean_std(values: np.ndarray, window: int, ddof: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rolling mean and standard deviation in a single O(n) pass over the data.
+        
+        Matches pandas rolling(window).mean()/.std(ddof): NaN until a window holds
+        window finite values, and exactly 0 std for flat windows.
+        """
+        n = len(values)
+        mean = np.full(n, np.nan)
+        std = np.full(n, np.nan)
+        
+        valid = np.isfinite(values)
+        if n < window or not valid.any():
+            return mean, std
+        
+        # Shift by the overall mean so the sum of squares does not swamp the variance
+        offset = values[valid].mean()
+        centered = np.where(valid, values - offset, 0.0)
+        
+        window_sums = AnalyticsEngine._window_sums
+        count = window_sums(valid.astype(np.float64), window)
+        s = window_sums(centered, window)
+        ss = window_sums(centered * centered, window)
+        
+        window_mean = s / window
+        full = count == window
+        mean[window - 1:] = np.where(full, window_mean + offset, np.nan)
+        
+        if window > ddof:
+            var = (ss - s * window_mean) / (window - ddof)
+            var[var <= 1e-12 * ss / (window - ddof)] = 0.0
+            std[window - 1:] = np.where(full, np.sqrt(var), np.nan)
+        return mean, std
+    
     @staticmethod
     def compute_price_statistics(prices: pd.Series) -> Dict[str, float]:
         """
@@ -27,16 +77,27 @@ class AnalyticsEngine:
         if len(prices) == 0:
             return {}
         
+        values = prices.to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        
+        if len(values) == 0:
+            return {}
+        
+        # One sort-based pass for all order statistics, one pass each for mean/std
+        price_min, q25, median, q75, price_max = np.percentile(values, [0, 25, 50, 75, 100])
+        mean = values.mean()
+        std = values.std(ddof=1) if len(values) > 1 else np.nan
+        
         return {
-            'mean': float(prices.mean()),
-            'std': float(prices.std()),
-            'min': float(prices.min()),
-            'max': float(prices.max()),
-            'median': float(prices.median()),
-            'q25': float(prices.quantile(0.25)),
-            'q75': float(prices.quantile(0.75)),
-            'range': float(prices.max() - prices.min()),
-            'cv': float(prices.std() / prices.mean()) if prices.mean() != 0 else 0.0  # Coefficient of variation
+            'mean': float(mean),
+            'std': float(std),
+            'min': float(price_min),
+            'max': float(price_max),
+            'median': float(median),
+            'q25': float(q25),
+            'q75': float(q75),
+            'range': float(price_max - price_min),
+            'cv': float(std / mean) if mean != 0 else 0.0  # Coefficient of variation
         }
     
     @staticmethod
@@ -51,12 +112,12 @@ class AnalyticsEngine:
             Spread series
         """
         # Align the two series on their index
-        aligned = pd.DataFrame({'series1': series1, 'series2': series2}).dropna()
+        index, values1, values2 = AnalyticsEngine._align_finite(series1, series2)
         
-        if len(aligned) < 2:
+        if len(index) < 2:
             return pd.Series()
         
-        return aligned['series1'] - aligned['series2']
+        return pd.Series(values1 - values2, index=index)
     
     @staticmethod
     def compute_zscore(series: pd.Series, window: int = 60) -> pd.Series:
@@ -73,11 +134,13 @@ class AnalyticsEngine:
         if len(series) < window:
             return pd.Series()
         
-        rolling_mean = series.rolling(window=window).mean()
-        rolling_std = series.rolling(window=window).std()
+        values = series.to_numpy(dtype=np.float64)
+        rolling_mean, rolling_std = AnalyticsEngine._rolling_mean_std(values, window)
         
-        zscore = (series - rolling_mean) / rolling_std
-        return zscore
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zscore = (values - rolling_mean) / rolling_std
+        zscore[rolling_std == 0] = np.nan
+        return pd.Series(zscore, index=series.index)
     
     @staticmethod
     def compute_rolling_correlation(
@@ -96,12 +159,32 @@ class AnalyticsEngine:
             Rolling correlation series
         """
         # Align the two series
-        aligned = pd.DataFrame({'series1': series1, 'series2': series2}).dropna()
+        index, x, y = AnalyticsEngine._align_finite(series1, series2)
         
-        if len(aligned) < window:
+        if len(index) < window:
             return pd.Series()
         
-        return aligned['series1'].rolling(window=window).corr(aligned['series2'])
+        # Center first so the running sums stay small relative to the windowed moments
+        x = x - x.mean()
+        y = y - y.mean()
+        
+        window_sums = AnalyticsEngine._window_sums
+        sx, sy = window_sums(x, window), window_sums(y, window)
+        sxx, syy, sxy = window_sums(x * x, window), window_sums(y * y, window), window_sums(x * y, window)
+        
+        # Closed-form Pearson r over each window
+        cov = window * sxy - sx * sy
+        var_x = window * sxx - sx * sx
+        var_y = window * syy - sy * sy
+        flat = (var_x <= 1e-12 * window * sxx) | (var_y <= 1e-12 * window * syy)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)
+        corr[flat] = np.nan
+        
+        result = np.full(len(x), np.nan)
+        result[window - 1:] = corr
+        return pd.Series(result, index=index)
     
     @staticmethod
     def compute_hedge_ratio(
@@ -121,27 +204,23 @@ class AnalyticsEngine:
             Dictionary containing hedge ratio, intercept, and R-squared
         """
         # Align the two series
-        aligned = pd.DataFrame({'series1': series1, 'series2': series2}).dropna()
+        index, y, x = AnalyticsEngine._align_finite(series1, series2)
         
-        if len(aligned) < 2:
+        if len(index) < 2:
             return {'hedge_ratio': 0.0, 'intercept': 0.0, 'r_squared': 0.0, 'method': method}
         
-        X = aligned['series2'].values.reshape(-1, 1)
-        y = aligned['series1'].values
-        
-        # Add constant term for intercept
-        X_with_const = np.column_stack([np.ones(len(X)), X])
-        
         try:
-            # OLS regression
-            beta = np.linalg.lstsq(X_with_const, y, rcond=None)[0]
-            intercept = beta[0]
-            hedge_ratio = beta[1]
+            # Closed-form OLS for y = intercept + hedge_ratio * x
+            dx = x - x.mean()
+            dy = y - y.mean()
+            ss_x = (dx * dx).sum()
+            ss_tot = (dy * dy).sum()
+            hedge_ratio = (dx * dy).sum() / ss_x if ss_x != 0 else 0.0
+            intercept = y.mean() - hedge_ratio * x.mean()
             
             # Calculate R-squared
-            y_pred = intercept + hedge_ratio * aligned['series2']
-            ss_res = ((aligned['series1'] - y_pred) ** 2).sum()
-            ss_tot = ((aligned['series1'] - aligned['series1'].mean()) ** 2).sum()
+            residuals = dy - hedge_ratio * dx
+            ss_res = (residuals * residuals).sum()
             r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0.0
             
             return {
@@ -189,7 +268,9 @@ class AnalyticsEngine:
             }
         
         try:
-            result = adfuller(series_clean)
+            # Fixed cube-root lag instead of an AIC search, which refits OLS once per candidate lag
+            maxlag = int(np.cbrt(len(series_clean)))
+            result = adfuller(series_clean, maxlag=maxlag, regression='c', autolag=None)
             
             return {
                 'adf_statistic': float(result[0]),
@@ -226,26 +307,28 @@ class AnalyticsEngine:
         if len(prices) == 0 or len(volumes) == 0:
             return {}
         
-        aligned = pd.DataFrame({'prices': prices, 'volumes': volumes}).dropna()
+        _, price_values, volume_values = AnalyticsEngine._align_finite(prices, volumes)
         
-        if len(aligned) == 0:
+        if len(price_values) == 0:
             return {}
         
-        # Create price bins
-        price_min = aligned['prices'].min()
-        price_max = aligned['prices'].max()
-        
-        bins_edges = np.linspace(price_min, price_max, bins + 1)
-        bin_indices = np.digitize(aligned['prices'], bins_edges[:-1])
+        # Uniform bins: the bin index is plain arithmetic, no binary search needed
+        price_min = price_values.min()
+        bin_width = (price_values.max() - price_min) / bins
+        if bin_width > 0:
+            bin_indices = np.minimum(((price_values - price_min) / bin_width).astype(np.int64), bins - 1)
+        else:
+            bin_indices = np.zeros(len(price_values), dtype=np.int64)
         
         # Aggregate volume by bin
-        volume_profile = aligned.groupby(bin_indices)['volumes'].sum()
-        bin_centers = (bins_edges[:-1] + bins_edges[1:]) / 2
+        volume_profile = np.bincount(bin_indices, weights=volume_values, minlength=bins)
+        occupied = np.bincount(bin_indices, minlength=bins) > 0
+        bin_centers = price_min + (np.arange(bins) + 0.5) * bin_width
         
         return {
-            'price_levels': [float(bin_centers[idx]) for idx in volume_profile.index if 0 <= idx < len(bin_centers)],
-            'volumes': [float(volume_profile.iloc[i]) for i in range(len(volume_profile))],
-            'poc': float(bin_centers[volume_profile.idxmax()])  # Point of Control (POC)
+            'price_levels': bin_centers[occupied].tolist(),
+            'volumes': volume_profile[occupied].tolist(),
+            'poc': float(bin_centers[np.argmax(volume_profile)])  # Point of Control (POC)
         }
     
     @staticmethod
@@ -258,12 +341,14 @@ class AnalyticsEngine:
         """Compute rolling volatility."""
         if len(returns) < window:
             return pd.Series()
-        return returns.rolling(window=window).std() * np.sqrt(252)  # Annualized
+        _, rolling_std = AnalyticsEngine._rolling_mean_std(returns.to_numpy(dtype=np.float64), window)
+        return pd.Series(rolling_std * np.sqrt(252), index=returns.index)  # Annualized
     
     @staticmethod
     def compute_moving_average(series: pd.Series, window: int) -> pd.Series:
         """Compute simple moving average."""
-        return series.rolling(window=window).mean()
+        rolling_mean, _ = AnalyticsEngine._rolling_mean_std(series.to_numpy(dtype=np.float64), window)
+        return pd.Series(rolling_mean, index=series.index)
     
     @staticmethod
     def compute_bollinger_bands(
@@ -272,8 +357,9 @@ class AnalyticsEngine:
         num_std: float = 2.0
     ) -> Dict[str, pd.Series]:
         """Compute Bollinger Bands."""
-        rolling_mean = series.rolling(window=window).mean()
-        rolling_std = series.rolling(window=window).std()
+        rolling_mean, rolling_std = AnalyticsEngine._rolling_mean_std(series.to_numpy(dtype=np.float64), window)
+        rolling_mean = pd.Series(rolling_mean, index=series.index)
+        rolling_std = pd.Series(rolling_std, index=series.index)
         
         return {
             'upper': rolling_mean + (rolling_std * num_std),
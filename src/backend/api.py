@@ -1,11 +1,17 @@
 """
 FastAPI backend for serving data and analytics endpoints.
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
+import asyncio
 import logging
+import time
+import orjson
+from collections import OrderedDict
 from datetime import datetime
 
 from src.models.database import TickDatabase
@@ -17,8 +23,14 @@ from src.utils.alert_manager import AlertManager
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, which also handles NumPy scalars."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
 # Initialize components
-app = FastAPI(title="Quant Analytics API", version="1.0.0")
+app = FastAPI(title="Quant Analytics API", version="1.0.0", default_response_class=ORJSONResponse)
 db = TickDatabase()
 collector = None
 alert_manager = AlertManager()
@@ -32,16 +44,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger payloads (OHLC histories, analytics series) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Response models
 class TickData(BaseModel):
     symbol: str
-    timestamp: str
+    timestamp: int  # epoch milliseconds
     price: float
     size: float
 
 class OHLCData(BaseModel):
     symbol: str
-    timestamp: str
+    timestamp: int  # epoch milliseconds
     open: float
     high: float
     low: float
@@ -57,14 +72,97 @@ class AnalyticsResponse(BaseModel):
     adf_test: Dict[str, Any]
     correlation: List[Dict[str, float]]
 
-# Store messages in memory for real-time access
-message_buffer = []
+# Number of ticks received since startup; the ticks themselves live in the database
+ticks_received = 0
+
+# Per-symbol data version, bumped each time a batch of the symbol's ticks is stored.
+# Clients key their caches on it so they refetch only when there is new data.
+data_versions: Dict[str, int] = {}
+
+# Data version each (symbol, timeframe)'s stored bars were last resampled at
+ohlc_versions: Dict[tuple, int] = {}
+
+# Analytics responses keyed by (symbol, timeframe, window) -> (computed_at, payload),
+# least recently used first
+analytics_cache: OrderedDict = OrderedDict()
+ANALYTICS_CACHE_MAX_TTL = 30  # seconds
+ANALYTICS_CACHE_MAX_ENTRIES = 128  # window is client-chosen, so bound the key space
+
+def get_analytics_ttl(timeframe: str) -> float:
+    """Cache lifetime for analytics: half a bar, capped at ANALYTICS_CACHE_MAX_TTL."""
+    return min(ANALYTICS_CACHE_MAX_TTL, DataResampler.get_timeframe_seconds(timeframe) / 2)
+
+def get_cached_analytics(cache_key: tuple, timeframe: str) -> Optional[Dict[str, Any]]:
+    """Return a fresh cached analytics payload, dropping the entry if it has expired."""
+    cached = analytics_cache.get(cache_key)
+    if cached is None:
+        return None
+    if time.time() - cached[0] >= get_analytics_ttl(timeframe):
+        del analytics_cache[cache_key]
+        return None
+    analytics_cache.move_to_end(cache_key)
+    return cached[1]
 
-def on_tick_received(tick: Dict[str, Any]):
-    """Callback for when a tick is received."""
-    global message_buffer
-    message_buffer.append(tick)
-    db.insert_tick(tick)
+def cache_analytics(cache_key: tuple, result: Dict[str, Any]):
+    """Store an analytics payload, evicting the least recently used entries past the limit."""
+    analytics_cache[cache_key] = (time.time(), result)
+    analytics_cache.move_to_end(cache_key)
+    while len(analytics_cache) > ANALYTICS_CACHE_MAX_ENTRIES:
+        analytics_cache.popitem(last=False)
+
+def invalidate_analytics_cache(symbol: str, timeframe: str):
+    """Drop cached analytics computed from a symbol/timeframe's OHLC bars."""
+    for key in [k for k in analytics_cache if k[0] == symbol and k[1] == timeframe]:
+        analytics_cache.pop(key, None)
+
+def refresh_ohlc(
+    symbol: str,
+    timeframe: str,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Resample a symbol's recent ticks to bars and store them.
+    
+    Bars only reach the database through here, so /analytics calls it too
+    before reading them. Cached analytics are dropped only if a bar changed.
+    
+    Returns:
+        The resampled bars, oldest first
+    """
+    version = data_versions.get(symbol, 0)
+    ticks = db.get_ticks(symbol, start_time, end_time, limit=10000)
+    if not ticks:
+        return []
+    
+    ohlc_list = DataResampler.resample_to_ohlc(ticks, timeframe)
+    if db.insert_ohlc_batch(ohlc_list):
+        invalidate_analytics_cache(symbol, timeframe)
+    if start_time is None and end_time is None:
+        ohlc_versions[(symbol, timeframe)] = version
+    return ohlc_list
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_ROWS = 500  # rows per streamed chunk
+
+def iter_ndjson(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON, a few hundred rows per chunk."""
+    chunk = []
+    for row in rows:
+        chunk.append(orjson.dumps(row))
+        if len(chunk) == NDJSON_CHUNK_ROWS:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+def on_ticks_received(ticks: List[Dict[str, Any]]):
+    """Callback for when the collector flushes a batch of ticks."""
+    global ticks_received
+    ticks_received += len(ticks)
+    db.insert_ticks_batch(ticks)
+    for symbol in {tick['symbol'] for tick in ticks}:
+        data_versions[symbol] = data_versions.get(symbol, 0) + 1
 
 @app.on_event("startup")
 async def startup():
@@ -75,7 +173,7 @@ async def startup():
 async def shutdown():
     """Cleanup on shutdown."""
     if collector:
-        collector.stop()
+        await asyncio.to_thread(collector.stop)
     db.close()
     logger.info("API shutdown")
 
@@ -92,7 +190,7 @@ async def start_collector(symbols: List[str]):
     if collector and collector.running:
         return {"status": "already_running", "symbols": symbols}
     
-    collector = BinanceCollector(symbols, on_tick_received)
+    collector = BinanceCollector(symbols, on_batch_callback=on_ticks_received)
     collector.start()
     
     return {"status": "started", "symbols": symbols}
@@ -103,7 +201,8 @@ async def stop_collector():
     global collector
     
     if collector and collector.running:
-        collector.stop()
+        # stop() joins the collector threads; keep that off the event loop
+        await asyncio.to_thread(collector.stop)
         return {"status": "stopped"}
     
     return {"status": "not_running"}
@@ -113,10 +212,12 @@ async def get_ticks(
     symbol: str,
     start_time: Optional[str] = None,
     end_time: Optional[str] = None,
-    limit: int = 1000
+    limit: int = 1000,
+    before: Optional[str] = None,
+    before_id: Optional[int] = None
 ):
-    """Get ticks for a symbol."""
-    ticks = db.get_ticks(symbol, start_time, end_time, limit)
+    """Get ticks for a symbol; page backwards by passing the oldest tick's timestamp and id as before and before_id."""
+    ticks = db.get_ticks(symbol, start_time, end_time, limit, before, before_id)
     return {"symbol": symbol, "count": len(ticks), "ticks": ticks}
 
 @app.get("/ohlc/{symbol}")
@@ -124,22 +225,22 @@ async def get_ohlc(
     symbol: str,
     timeframe: str = "1min",
     start_time: Optional[str] = None,
-    end_time: Optional[str] = None
+    end_time: Optional[str] = None,
+    accept: Optional[str] = Header(None)
 ):
-    """Get OHLC data for a symbol."""
-    # Get raw ticks
-    ticks = db.get_ticks(symbol, start_time, end_time, limit=10000)
-    
-    if not ticks:
-        return {"symbol": symbol, "timeframe": timeframe, "count": 0, "data": []}
+    """
+    Get OHLC data for a symbol.
     
-    # Resample ticks to OHLC
-    ohlc_list = DataResampler.resample_to_ohlc(ticks, timeframe)
+    Clients sending Accept: application/x-ndjson get the bars streamed one JSON
+    object per line instead of a single JSON document.
+    """
+    stream = accept is not None and NDJSON_MEDIA_TYPE in accept
     
-    # Store OHLC data in database
-    for ohlc_data in ohlc_list:
-        db.insert_ohlc(ohlc_data)
+    # Resample raw ticks to OHLC and store the bars
+    ohlc_list = refresh_ohlc(symbol, timeframe, start_time, end_time)
     
+    if stream:
+        return StreamingResponse(iter_ndjson(ohlc_list), media_type=NDJSON_MEDIA_TYPE)
     return {"symbol": symbol, "timeframe": timeframe, "count": len(ohlc_list), "data": ohlc_list}
 
 @app.get("/symbols")
@@ -155,6 +256,15 @@ async def get_analytics(
     window: int = 60
 ):
     """Get analytics for a symbol."""
+    # Bring the stored bars up to date first; this drops stale cache entries
+    if ohlc_versions.get((symbol, timeframe)) != data_versions.get(symbol, 0):
+        refresh_ohlc(symbol, timeframe)
+    
+    cache_key = (symbol, timeframe, window)
+    cached = get_cached_analytics(cache_key, timeframe)
+    if cached is not None:
+        return cached
+    
     # Get OHLC data
     ohlc_data = db.get_ohlc(symbol, timeframe)
     
@@ -164,7 +274,7 @@ async def get_analytics(
     # Convert to DataFrame
     import pandas as pd
     df = pd.DataFrame(ohlc_data)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
     df = df.set_index('timestamp')
     
     prices = df['close']
@@ -175,8 +285,8 @@ async def get_analytics(
     # Z-score
     zscores = AnalyticsEngine.compute_zscore(prices, window=window)
     zscore_data = [
-        {"timestamp": ts.isoformat(), "zscore": float(z)}
-        for ts, z in zscores.items()
+        {"timestamp": ts.value // 1_000_000, "zscore": float(z)}
+        for ts, z in zscores.dropna().items()
     ]
     
     # ADF test
@@ -186,22 +296,29 @@ async def get_analytics(
     returns = AnalyticsEngine.compute_returns(prices)
     volatility = AnalyticsEngine.compute_volatility(returns, window=window)
     
-    return {
+    result = {
         "symbol": symbol,
         "timeframe": timeframe,
+        "version": data_versions.get(symbol, 0),
         "price_stats": price_stats,
         "zscore": zscore_data[-100:],  # Last 100 points
         "adf_test": adf_result,
         "volatility": [
-            {"timestamp": ts.isoformat(), "volatility": float(v)}
-            for ts, v in volatility.items()
+            {"timestamp": ts.value // 1_000_000, "volatility": float(v)}
+            for ts, v in volatility.dropna().items()
         ][-100:]
     }
+    cache_analytics(cache_key, result)
+    
+    return result
 
 @app.post("/add_alert")
 async def add_alert(condition: str):
     """Add a new alert."""
-    alert = alert_manager.add_alert(condition)
+    try:
+        alert_manager.add_alert(condition)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {"status": "added", "condition": condition}
 
 @app.get("/alerts")
@@ -216,7 +333,8 @@ async def get_stats():
     stats = {
         "collector_running": collector.running if collector else False,
         "symbols": db.get_symbols(),
-        "message_buffer_size": len(message_buffer)
+        "message_buffer_size": ticks_received,
+        "data_versions": dict(data_versions)
     }
     
     if collector:
@@ -1,37 +1,81 @@
 """
 WebSocket data collector for Binance futures tick data.
 """
-import json
-import websocket
+import asyncio
+import msgspec
+import websockets
+from collections import deque
 import threading
+import queue
 import logging
-from datetime import datetime
 from typing import List, Optional, Callable
-import time
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class Trade(msgspec.Struct):
+    """Binance trade event; only the fields the collector uses are decoded."""
+    e: str
+    s: str
+    p: str
+    q: str
+    T: int
+    t: int
+    m: bool
+
+
+class StreamFrame(msgspec.Struct):
+    """Combined-stream wrapper: {"stream": "btcusdt@trade", "data": {...trade...}}."""
+    stream: str
+    data: Trade
+
+
 class BinanceCollector:
     """WebSocket collector for Binance futures tick data."""
     
-    def __init__(self, symbols: List[str], on_message_callback: Optional[Callable] = None):
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 0.5  # seconds
+    MAX_BUFFERED_MESSAGES = 100_000
+    
+    def __init__(
+        self,
+        symbols: List[str],
+        on_message_callback: Optional[Callable] = None,
+        on_batch_callback: Optional[Callable] = None
+    ):
         """
         Initialize collector.
         
         Args:
             symbols: List of symbols to collect (e.g., ['btcusdt', 'ethusdt'])
             on_message_callback: Callback function to handle incoming messages
+            on_batch_callback: Callback function receiving lists of ticks, called
+                every BATCH_SIZE ticks or FLUSH_INTERVAL seconds from a writer thread
         """
         self.symbols = [symbol.lower() for symbol in symbols]
         self.on_message_callback = on_message_callback
+        self.on_batch_callback = on_batch_callback
         self.running = False
-        self.ws_connections = []
-        self.message_buffer = []
-        self.buffer_lock = threading.Lock()
+        self.loop = None
+        self.loop_thread = None
+        self.stream_task = None
+        # deque append/popleft are atomic, so the event loop thread and the
+        # writer thread share these buffers without a lock. Ticks are only kept
+        # in message_buffer when there is no batch callback to hand them to.
+        self.message_buffer = deque(maxlen=self.MAX_BUFFERED_MESSAGES)
+        self.message_count = 0
+        self.pending_batch = deque()
+        self.batch_queue = queue.Queue(maxsize=64)
+        self.writer_thread = None
+        self.frame_decoder = msgspec.json.Decoder(StreamFrame)
     
-    def _normalize_tick(self, data: dict) -> dict:
+    def _normalize_tick(self, trade: Trade) -> dict:
         """
         Normalize tick data from Binance WebSocket.
         
@@ -48,36 +92,46 @@ class BinanceCollector:
             "T": 123456789,
             "m": true
         }
+        
+        Timestamps are kept as epoch milliseconds, which is also how the
+        database stores them.
         """
         try:
-            # Use 'T' (trade time) or 'E' (event time) as timestamp
-            timestamp = datetime.fromtimestamp(
-                data.get('T', data.get('E', time.time() * 1000)) / 1000
-            ).isoformat()
-            
             return {
-                'symbol': data.get('s', '').lower(),  # Convert to lowercase
-                'timestamp': timestamp,
-                'price': float(data.get('p', 0)),
-                'size': float(data.get('q', 0)),
-                'event_time': data.get('T'),
-                'trade_id': data.get('t'),
-                'is_buyer_maker': data.get('m', False)
+                'symbol': trade.s.lower(),  # Convert to lowercase
+                'timestamp': trade.T,
+                'price': float(trade.p),
+                'size': float(trade.q),
+                'event_time': trade.T,
+                'trade_id': trade.t,
+                'is_buyer_maker': trade.m
             }
-        except Exception as e:
+        except ValueError as e:
             logger.error(f"Error normalizing tick: {e}")
             return None
     
-    def _on_message(self, ws, message, symbol: str):
+    def _on_message(self, message: str):
         """Handle incoming WebSocket message."""
         try:
-            data = json.loads(message)
+            trade = self.frame_decoder.decode(message).data
             
             # Filter for trade events
-            if data.get('e') == 'trade':
-                normalized = self._normalize_tick(data)
+            if trade.e == 'trade':
+                normalized = self._normalize_tick(trade)
                 if normalized:
-                    with self.buffer_lock:
+                    self.message_count += 1
+                    
+                    if self.on_batch_callback:
+                        self.pending_batch.append(normalized)
+                        # Never block the event loop on a slow writer: while the
+                        # queue is full, ticks wait in pending_batch and go out as
+                        # soon as it has room. Only this thread puts, so a queue
+                        # that is not full cannot fill before put_nowait.
+                        if len(self.pending_batch) >= self.BATCH_SIZE and not self.batch_queue.full():
+                            batch = self._drain(self.pending_batch, self.BATCH_SIZE)
+                            if batch:
+                                self.batch_queue.put_nowait(batch)
+                    else:
                         self.message_buffer.append(normalized)
                     
                     # Call callback if provided
@@ -86,33 +140,69 @@ class BinanceCollector:
         except Exception as e:
             logger.error(f"Error processing message: {e}")
     
-    def _on_open(self, ws):
-        """Handle WebSocket open."""
-        logger.info("WebSocket connection opened")
+    @staticmethod
+    def _drain(buffer: deque, limit: Optional[int] = None) -> List[dict]:
+        """Pop up to limit items (all if None) from the left of a deque."""
+        items = []
+        try:
+            while limit is None or len(items) < limit:
+                items.append(buffer.popleft())
+        except IndexError:
+            pass
+        return items
     
-    def _on_error(self, ws, error):
-        """Handle WebSocket error."""
-        logger.error(f"WebSocket error: {error}")
+    def _write_batches(self):
+        """Writer thread: hand full batches, or partial ones after FLUSH_INTERVAL, to the callback."""
+        while self.running or not self.batch_queue.empty():
+            try:
+                batch = self.batch_queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                batch = self._drain(self.pending_batch)
+            
+            if batch:
+                try:
+                    self.on_batch_callback(batch)
+                except Exception as e:
+                    logger.error(f"Error in batch callback: {e}")
+        
+        # Flush the remainder once the streams are closed
+        batch = self._drain(self.pending_batch)
+        if batch:
+            try:
+                self.on_batch_callback(batch)
+            except Exception as e:
+                logger.error(f"Error in batch callback: {e}")
     
-    def _on_close(self, ws, close_status_code, close_msg):
-        """Handle WebSocket close."""
-        logger.info("WebSocket connection closed")
+    def _stream_url(self) -> str:
+        """Combined-stream URL carrying the trade streams of every symbol."""
+        streams = '/'.join(f"{symbol}@trade" for symbol in self.symbols)
+        return f"wss://fstream.binance.com/stream?streams={streams}"
     
-    def _create_connection(self, symbol: str) -> websocket.WebSocketApp:
-        """Create WebSocket connection for a symbol."""
-        url = f"wss://fstream.binance.com/ws/{symbol}@trade"
+    async def _stream(self):
+        """Receive trades for all symbols over one connection until it closes or is cancelled."""
+        logger.info(f"Starting WebSocket for {', '.join(self.symbols)}")
         
-        def on_message_wrapper(ws, msg):
-            self._on_message(ws, msg, symbol)
-        
-        ws = websocket.WebSocketApp(
-            url,
-            on_open=self._on_open,
-            on_message=on_message_wrapper,
-            on_error=self._on_error,
-            on_close=self._on_close
-        )
-        return ws
+        try:
+            async with websockets.connect(self._stream_url(), ping_interval=20) as ws:
+                logger.info("WebSocket connection opened")
+                async for message in ws:
+                    self._on_message(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket error: {e}")
+        finally:
+            logger.info("WebSocket connection closed")
+    
+    def _run_loop(self):
+        """Event loop thread: drive the stream until it finishes or is cancelled."""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.stream_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
     
     def start(self):
         """Start collecting data for all symbols."""
@@ -121,41 +211,45 @@ class BinanceCollector:
             return
         
         self.running = True
-        self.ws_connections = []
         
-        # Create WebSocket connection for each symbol
-        for symbol in self.symbols:
-            logger.info(f"Starting WebSocket for {symbol}")
-            ws = self._create_connection(symbol)
-            self.ws_connections.append(ws)
-            
-            # Start WebSocket in a separate thread
-            thread = threading.Thread(target=ws.run_forever, daemon=True)
-            thread.start()
+        if self.on_batch_callback:
+            self.writer_thread = threading.Thread(target=self._write_batches, daemon=True)
+            self.writer_thread.start()
+        
+        # One multiplexed connection for all symbols, on its own event loop thread
+        self.loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        self.stream_task = self.loop.create_task(self._stream())
+        self.loop_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.loop_thread.start()
         
         logger.info(f"Started collectors for {len(self.symbols)} symbols")
     
     def stop(self):
         """Stop collecting data."""
         self.running = False
-        for ws in self.ws_connections:
+        
+        if self.loop_thread:
             try:
-                ws.close()
-            except:
-                pass
-        self.ws_connections = []
+                self.loop.call_soon_threadsafe(self.stream_task.cancel)
+            except RuntimeError:
+                pass  # Loop already closed
+            self.loop_thread.join(timeout=5)
+            self.loop_thread = None
+        
+        if self.writer_thread:
+            self.writer_thread.join(timeout=5)
+            self.writer_thread = None
         logger.info("Stopped all collectors")
     
     def get_buffered_messages(self, clear: bool = True) -> List[dict]:
         """Get buffered messages and optionally clear the buffer."""
-        with self.buffer_lock:
-            messages = self.message_buffer.copy()
-            if clear:
-                self.message_buffer = []
-            return messages
+        if clear:
+            return self._drain(self.message_buffer)
+        return list(self.message_buffer.copy())
     
     def get_message_count(self) -> int:
-        """Get current message count in buffer."""
-        with self.buffer_lock:
-            return len(self.message_buffer)
+        """Get current message count in buffer, or ticks received so far in batch mode."""
+        if self.on_batch_callback:
+            return self.message_count
+        return len(self.message_buffer)
 
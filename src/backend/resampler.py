@@ -1,8 +1,9 @@
 """
 Data resampling and aggregation for different timeframes.
 """
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -19,61 +20,117 @@ class DataResampler:
             return pd.DataFrame()
         
         df = pd.DataFrame(ticks)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         df = df.set_index('timestamp')
         df = df.sort_index()
         return df
     
     @staticmethod
-    def resample_to_ohlc(
-        ticks: List[Dict[str, Any]],
+    def ticks_to_arrays(ticks: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Convert list of ticks to columnar arrays.
+        
+        Returns:
+            (timestamps in epoch milliseconds as int64, prices as float64, sizes as float64)
+        """
+        timestamps = np.fromiter((tick['timestamp'] for tick in ticks), dtype=np.int64, count=len(ticks))
+        prices = np.fromiter((tick['price'] for tick in ticks), dtype=np.float64, count=len(ticks))
+        sizes = np.fromiter((tick['size'] for tick in ticks), dtype=np.float64, count=len(ticks))
+        return timestamps, prices, sizes
+    
+    @staticmethod
+    def resample_arrays(
+        timestamps: np.ndarray,
+        prices: np.ndarray,
+        sizes: np.ndarray,
+        symbol: str,
         timeframe: str = '1min'
     ) -> List[Dict[str, Any]]:
         """
-        Resample ticks to OHLC format.
+        Resample columnar tick arrays to OHLC format with bucketed NumPy reductions.
         
         Args:
-            ticks: List of tick dictionaries
+            timestamps: Tick times in epoch milliseconds (int64)
+            prices: Tick prices
+            sizes: Tick sizes
+            symbol: Symbol the ticks belong to
             timeframe: Resampling timeframe (e.g., '1s', '1min', '5min')
         
         Returns:
-            List of OHLC dictionaries
+            List of OHLC dictionaries, one per bar between the first and last tick
         """
-        if not ticks:
+        if len(timestamps) == 0:
             return []
         
-        df = DataResampler.ticks_to_dataframe(ticks)
+        order = np.argsort(timestamps, kind='stable')
+        timestamps, prices, sizes = timestamps[order], prices[order], sizes[order]
         
-        if df.empty:
-            return []
+        # Bar boundaries are where the bucket number changes
+        bucket_ms = pd.Timedelta(timeframe).value // 1_000_000
+        buckets = timestamps // bucket_ms
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        ends = np.append(starts[1:], len(buckets)) - 1
         
-        symbol = df['symbol'].iloc[0]
+        opens = prices[starts]
+        highs = np.maximum.reduceat(prices, starts)
+        lows = np.minimum.reduceat(prices, starts)
+        closes = prices[ends]
+        volumes = np.add.reduceat(sizes, starts)
+        trade_counts = ends - starts + 1
         
-        # Resample to OHLC
-        ohlc = df['price'].resample(timeframe).ohlc()
-        volume = df['size'].resample(timeframe).sum()
-        trade_count = df.resample(timeframe).size()
+        # Empty bars in between take their prices from the next traded bar
+        traded = buckets[starts]
+        all_buckets = np.arange(traded[0], traded[-1] + 1)
+        next_traded = np.searchsorted(traded, all_buckets)
+        is_traded = traded[next_traded] == all_buckets
         
-        # Combine results
-        result = pd.concat([ohlc, volume.rename('volume'), trade_count.rename('trade_count')], axis=1)
-        result = result.bfill()  # Fill missing values with last known price
+        bar_volumes = np.where(is_traded, volumes[next_traded], 0.0)
+        bar_counts = np.where(is_traded, trade_counts[next_traded], 0)
+        bar_times = all_buckets * bucket_ms
         
-        # Convert to list of dicts
-        ohlc_list = []
-        for timestamp, row in result.iterrows():
-            ohlc_list.append({
+        return [
+            {
                 'symbol': symbol,
-                'timestamp': timestamp.isoformat(),
-                'open': float(row['open']),
-                'high': float(row['high']),
-                'low': float(row['low']),
-                'close': float(row['close']),
-                'volume': float(row['volume']),
-                'trade_count': int(row['trade_count']),
+                'timestamp': timestamp,
+                'open': open_,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume,
+                'trade_count': trade_count,
                 'timeframe': timeframe
-            })
+            }
+            for timestamp, open_, high, low, close, volume, trade_count in zip(
+                bar_times.tolist(),
+                opens[next_traded].tolist(),
+                highs[next_traded].tolist(),
+                lows[next_traded].tolist(),
+                closes[next_traded].tolist(),
+                bar_volumes.tolist(),
+                bar_counts.tolist()
+            )
+        ]
+    
+    @staticmethod
+    def resample_to_ohlc(
+        ticks: List[Dict[str, Any]],
+        timeframe: str = '1min'
+    ) -> List[Dict[str, Any]]:
+        """
+        Resample ticks to OHLC format.
+        
+        Args:
+            ticks: List of tick dictionaries
+            timeframe: Resampling timeframe (e.g., '1s', '1min', '5min')
+        
+        Returns:
+            List of OHLC dictionaries
+        """
+        if not ticks:
+            return []
         
-        return ohlc_list
+        timestamps, prices, sizes = DataResampler.ticks_to_arrays(ticks)
+        return DataResampler.resample_arrays(timestamps, prices, sizes, ticks[0]['symbol'], timeframe)
     
     @staticmethod
     def get_timeframe_seconds(timeframe: str) -> int:
@@ -0,0 +1,64 @@
+"""
+In-process uvicorn runner for the launchers.
+"""
+import socket
+import threading
+import uvicorn
+
+API_HOST = "127.0.0.1"
+API_PORT = 8000
+
+
+def is_api_running(timeout: float = 0.2) -> bool:
+    """Check if the API is accepting TCP connections on API_HOST:API_PORT."""
+    try:
+        with socket.create_connection((API_HOST, API_PORT), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class NotifyingServer(uvicorn.Server):
+    """uvicorn server that sets an event as soon as it is accepting connections."""
+
+    def __init__(self, config: uvicorn.Config, ready: threading.Event):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        self.ready.set()
+
+
+def start_api_thread(timeout: float) -> bool:
+    """
+    Run the API in a daemon thread and wait for it to start listening.
+
+    Args:
+        timeout: Seconds to wait for startup
+
+    Returns:
+        True if the server is accepting connections, False if it failed to start
+    """
+    ready = threading.Event()
+    server = NotifyingServer(
+        uvicorn.Config(
+            "src.backend.api:app",
+            host=API_HOST,
+            port=API_PORT,
+            log_level="info"
+        ),
+        ready
+    )
+
+    def run_api():
+        try:
+            server.run()
+        finally:
+            ready.set()  # Also wake the waiter if startup failed
+
+    threading.Thread(target=run_api, daemon=True).start()
+
+    # Wait for the server to signal that it is listening
+    ready.wait(timeout=timeout)
+    return server.started and not server.should_exit
@@ -7,9 +7,13 @@ import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-import requests
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor, CancelledError
 from datetime import datetime, timedelta
 import time
+import random
+import threading
 import json
 
 # Page configuration
@@ -48,67 +52,176 @@ if 'data_cache' not in st.session_state:
 if 'last_update' not in st.session_state:
     st.session_state.last_update = {}
 
+# Most candles drawn in one chart; longer histories are merged into wider bars
+MAX_CHART_BARS = 500
+
+# Cache lifetimes (seconds); market data matches the default auto-refresh interval.
+# Market data fetches are also keyed on the API's per-symbol data version, so
+# newly stored ticks show up on the next rerun instead of after the TTL.
+SYMBOLS_TTL = 60
+STATS_TTL = 2
+DATA_TTL = 5
+
+@st.cache_resource
+def get_client():
+    """
+    Shared keep-alive HTTP client, created once per server process.
+    
+    Connections are pooled across reruns and sessions, failed connects are
+    retried once, and responses are gzip-decoded (httpx sends Accept-Encoding).
+    """
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=10.0,
+        transport=httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            retries=1
+        )
+    )
+
+@st.cache_resource
+def get_executor():
+    """Shared thread pool for running a rerun's independent fetches concurrently."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="fetch")
+
+def fetch_result(future):
+    """
+    Wait for a submitted fetch.
+    
+    Failures are reported here, on the script thread, and come back as None.
+    """
+    try:
+        return future.result()
+    except Exception as e:
+        st.error(f"Error fetching data: {e}")
+        return None
+
+def cancel_stale_fetches(key):
+    """
+    Abandon fetches started for a different (symbol, timeframe) than key.
+    
+    Queued fetches are dropped outright; running ones see their cancel event
+    and stop at the next chance, closing their connection.
+    """
+    inflight = st.session_state.get('inflight')
+    if inflight and inflight['key'] == key:
+        inflight['futures'] = [f for f in inflight['futures'] if not f.done()]
+        return
+    if inflight:
+        inflight['cancel'].set()
+        for future in inflight['futures']:
+            future.cancel()
+    st.session_state.inflight = {'key': key, 'cancel': threading.Event(), 'futures': []}
+
+def submit_fetch(fn, *args):
+    """Run a market data fetch on the shared pool, tracked so a new selection can cancel it."""
+    inflight = st.session_state.inflight
+    future = get_executor().submit(fn, *args, _cancel=inflight['cancel'])
+    inflight['futures'].append(future)
+    return future
+
+def get_json(path, params=None):
+    """GET a JSON document from the API, raising on HTTP errors."""
+    response = get_client().get(path, params=params)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=SYMBOLS_TTL, show_spinner=False)
 def fetch_symbols():
     """Fetch available symbols from API."""
+    return get_json("/symbols").get('symbols', [])
+
+@st.cache_data(ttl=STATS_TTL, show_spinner=False)
+def fetch_stats():
+    """Fetch system statistics; None if the API is unreachable."""
     try:
-        response = requests.get(f"{API_URL}/symbols")
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('symbols', [])
-    except Exception as e:
-        st.error(f"Error fetching symbols: {e}")
-    return []
+        return get_json("/stats")
+    except httpx.HTTPError:
+        return None
 
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
 def fetch_ticks(symbol, limit=1000):
     """Fetch ticks for a symbol."""
-    try:
-        response = requests.get(f"{API_URL}/ticks/{symbol}?limit={limit}")
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('ticks', [])
-    except Exception as e:
-        st.error(f"Error fetching ticks: {e}")
-    return []
+    return get_json(f"/ticks/{symbol}", params={"limit": limit}).get('ticks', [])
 
-def fetch_ohlc(symbol, timeframe='1min'):
-    """Fetch OHLC data for a symbol."""
-    try:
-        # Convert symbol to lowercase for API consistency
-        symbol = symbol.lower()
-        response = requests.get(f"{API_URL}/ohlc/{symbol}?timeframe={timeframe}")
-        if response.status_code == 200:
-            data = response.json()
-            return data.get('data', [])
-    except Exception as e:
-        st.error(f"Error fetching OHLC data: {e}")
-    return []
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def fetch_ohlc(symbol, timeframe='1min', version=0, _cancel=None):
+    """
+    Fetch OHLC data for a symbol, streamed as NDJSON; version only keys the cache.
+    
+    Setting _cancel abandons the download, closing the connection mid-stream.
+    """
+    # Convert symbol to lowercase for API consistency
+    symbol = symbol.lower()
+    with get_client().stream(
+        "GET", f"/ohlc/{symbol}",
+        params={"timeframe": timeframe},
+        headers={"Accept": "application/x-ndjson"}
+    ) as response:
+        response.raise_for_status()
+        # Rows are decoded line by line as they arrive, never as one big document
+        rows = []
+        for line in response.iter_lines():
+            if _cancel is not None and _cancel.is_set():
+                raise CancelledError(f"OHLC fetch for {symbol} cancelled")
+            if line:
+                rows.append(orjson.loads(line))
+        return rows
 
-def fetch_analytics(symbol, timeframe='1min', window=60):
-    """Fetch analytics for a symbol."""
-    try:
-        # Convert symbol to lowercase for API consistency
-        symbol = symbol.lower()
-        response = requests.get(f"{API_URL}/analytics/{symbol}?timeframe={timeframe}&window={window}")
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
-        st.error(f"Error fetching analytics: {e}")
-    return {}
+@st.cache_data(ttl=DATA_TTL, show_spinner=False)
+def fetch_analytics(symbol, timeframe='1min', window=60, version=0, _cancel=None):
+    """Fetch analytics for a symbol; version only keys the cache."""
+    # Convert symbol to lowercase for API consistency
+    symbol = symbol.lower()
+    if _cancel is not None and _cancel.is_set():
+        raise CancelledError(f"Analytics fetch for {symbol} cancelled")
+    return get_json(f"/analytics/{symbol}", params={"timeframe": timeframe, "window": window})
+
+def frame_fingerprint(df):
+    """
+    Cheap cache key for a bar DataFrame.
+    
+    Bars are only appended, plus the first bar (which slides with the tick
+    window) and the last one (still filling) being rewritten, so the shape
+    and those two rows identify the contents without hashing every value.
+    """
+    return (df.shape, df.index[:1].tolist(), df.index[-1:].tolist(),
+            df.iloc[:1].to_numpy().tolist(), df.iloc[-1:].to_numpy().tolist())
+
+def rows_fingerprint(rows):
+    """Cheap cache key for a list of OHLC rows: length plus first and last bar (see frame_fingerprint)."""
+    # No lists in the key, or hashing it would recurse back into this function
+    return (len(rows), rows[0], rows[-1]) if rows else 0
+
+@st.cache_data(ttl=DATA_TTL, show_spinner=False, max_entries=32, hash_funcs={list: rows_fingerprint})
+def ohlc_to_df(rows):
+    """Build the bar DataFrame indexed by UTC bar time; shared by every view."""
+    df = pd.DataFrame.from_records(rows, index='timestamp')
+    df.index = pd.to_datetime(df.index, unit='ms', utc=True)
+    return df
+
+def downsample_ohlc(df, max_bars=MAX_CHART_BARS):
+    """Merge consecutive bars so at most max_bars remain, keeping each group's true OHLC."""
+    step = -(-len(df) // max_bars)
+    if step <= 1:
+        return df
+    groups = np.arange(len(df)) // step
+    merged = df.groupby(groups).agg({
+        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'
+    })
+    merged.index = df.index[::step]
+    return merged
 
 def plot_price_chart(df, symbol):
     """Plot price chart with candlesticks."""
-    # Handle both column naming conventions
-    open_col = 'open' if 'open' in df.columns else 'open_price'
-    high_col = 'high' if 'high' in df.columns else 'high_price'
-    low_col = 'low' if 'low' in df.columns else 'low_price'
-    close_col = 'close' if 'close' in df.columns else 'close_price'
+    df = downsample_ohlc(df)
     
     fig = go.Figure(data=[go.Candlestick(
         x=df.index,
-        open=df[open_col],
-        high=df[high_col],
-        low=df[low_col],
-        close=df[close_col],
+        open=df['open'],
+        high=df['high'],
+        low=df['low'],
+        close=df['close'],
         name=symbol
     )])
     
@@ -117,12 +230,25 @@ def plot_price_chart(df, symbol):
         xaxis_title='Time',
         yaxis_title='Price',
         height=500,
-        xaxis_rangeslider_visible=False
+        xaxis_rangeslider_visible=False,
+        # Keep the user's zoom/pan across reruns until the symbol changes
+        uirevision=symbol
     )
     
     return fig
 
-def plot_spread_and_zscore(prices_df, zscores):
+@st.cache_data(show_spinner=False, max_entries=32, hash_funcs={pd.DataFrame: frame_fingerprint})
+def price_chart_json(df, symbol):
+    """
+    Candlestick figure for df, serialized once to a JSON string.
+    
+    A cache hit hands back the string instead of unpickling a Figure, and the
+    plain dict it decodes to is cheaper for st.plotly_chart to validate.
+    """
+    return plot_price_chart(df, symbol).to_json()
+
+@st.cache_data(show_spinner=False, max_entries=32, hash_funcs={pd.DataFrame: frame_fingerprint})
+def plot_spread_and_zscore(prices_df, zscores, uirevision=None):
     """Plot spread and z-score."""
     fig = make_subplots(
         rows=2, cols=1,
@@ -146,7 +272,7 @@ def plot_spread_and_zscore(prices_df, zscores):
     # Z-score chart
     if zscores and len(zscores) > 0:
         zscore_df = pd.DataFrame(zscores)
-        zscore_df['timestamp'] = pd.to_datetime(zscore_df['timestamp'])
+        zscore_df['timestamp'] = pd.to_datetime(zscore_df['timestamp'], unit='ms', utc=True)
         
         fig.add_trace(
             go.Scatter(
@@ -164,7 +290,7 @@ def plot_spread_and_zscore(prices_df, zscores):
         fig.add_hline(y=-2, line_dash="dash", line_color="red", row=2, col=1)
         fig.add_hline(y=0, line_dash="dash", line_color="gray", row=2, col=1)
     
-    fig.update_layout(height=700, title_text="Price and Z-Score Analysis")
+    fig.update_layout(height=700, title_text="Price and Z-Score Analysis", uirevision=uirevision)
     
     return fig
 
@@ -202,8 +328,13 @@ def main():
     with st.sidebar:
         st.header("⚙️ Controls")
         
+        # Symbols and system status are independent, so fetch them together
+        executor = get_executor()
+        symbols_future = executor.submit(fetch_symbols)
+        stats_future = executor.submit(fetch_stats)
+        symbols, stats = fetch_result(symbols_future), fetch_result(stats_future)
+        
         # Symbols selection
-        symbols = fetch_symbols()
         if symbols:
             selected_symbol = st.selectbox(
                 "Select Symbol",
@@ -234,34 +365,39 @@ def main():
         st.header("📡 Data Collector")
         
         col1, col2 = st.columns(2)
+        collector_changed = False
         with col1:
             if st.button("Start"):
                 symbols_list = [selected_symbol] if selected_symbol else ['btcusdt']
-                response = requests.post(f"{API_URL}/start_collector", json=symbols_list)
+                response = get_client().post("/start_collector", json=symbols_list)
                 if response.status_code == 200:
                     st.success("Collector started")
+                    collector_changed = True
                 else:
                     st.error("Failed to start collector")
         
         with col2:
             if st.button("Stop"):
-                response = requests.post(f"{API_URL}/stop_collector")
+                response = get_client().post("/stop_collector")
                 if response.status_code == 200:
                     st.success("Collector stopped")
+                    collector_changed = True
                 else:
                     st.error("Failed to stop collector")
         
+        # Status fetched above predates a start/stop in this run
+        if collector_changed:
+            fetch_stats.clear()
+            stats = fetch_stats()
+        
         # System status
         st.divider()
         st.header("📊 System Status")
-        try:
-            response = requests.get(f"{API_URL}/stats")
-            if response.status_code == 200:
-                stats = response.json()
-                st.metric("Collector Status", "Running" if stats.get('collector_running') else "Stopped")
-                st.metric("Buffer Size", stats.get('message_buffer_size', 0))
-                st.metric("Symbols", len(stats.get('symbols', [])))
-        except:
+        if stats is not None:
+            st.metric("Collector Status", "Running" if stats.get('collector_running') else "Stopped")
+            st.metric("Buffer Size", stats.get('message_buffer_size', 0))
+            st.metric("Symbols", len(stats.get('symbols', [])))
+        else:
             st.error("Cannot connect to API")
     
     # Main content
@@ -269,24 +405,30 @@ def main():
         st.info("Please select a symbol from the sidebar")
         return
     
-    # Tabs for different views
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Price Chart", "📈 Analytics", "📉 Statistics", "⚙️ Settings"])
+    # Changes whenever the API stores new ticks for the symbol
+    data_version = (stats or {}).get('data_versions', {}).get(selected_symbol.lower(), 0)
+    
+    # Anything still downloading for a previous selection is no longer wanted
+    cancel_stale_fetches((selected_symbol, timeframe))
+    
+    # View selector styled as tabs; unlike st.tabs only the chosen view's body
+    # runs, so the other views' data is never fetched
+    views = ["📊 Price Chart", "📈 Analytics", "📉 Statistics", "⚙️ Settings"]
+    active_view = st.radio("View", views, horizontal=True, label_visibility="collapsed", key="active_tab")
     
-    with tab1:
+    if active_view == views[0]:
         st.header(f"Price Analysis: {selected_symbol}")
         
-        # Fetch OHLC data
-        ohlc_data = fetch_ohlc(selected_symbol, timeframe)
+        # OHLC data
+        ohlc_data = fetch_result(submit_fetch(fetch_ohlc, selected_symbol, timeframe, data_version))
         
         if ohlc_data and len(ohlc_data) > 0:
             # Convert to DataFrame
-            df = pd.DataFrame(ohlc_data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.set_index('timestamp')
+            df = ohlc_to_df(ohlc_data)
             
             # Plot price chart
-            fig = plot_price_chart(df, selected_symbol)
-            st.plotly_chart(fig, use_container_width=True)
+            fig = orjson.loads(price_chart_json(df, selected_symbol))
+            st.plotly_chart(fig, use_container_width=True, theme=None, key="price_chart")
             
             # Display last 20 values
             st.subheader("Recent OHLC Data")
@@ -294,11 +436,14 @@ def main():
         else:
             st.info(f"No data available for {selected_symbol}. Start the collector to begin receiving data.")
     
-    with tab2:
+    elif active_view == views[1]:
         st.header(f"Analytics: {selected_symbol}")
         
-        # Fetch analytics
-        analytics = fetch_analytics(selected_symbol, timeframe, window)
+        # This view needs both payloads; fetch them concurrently
+        ohlc_future = submit_fetch(fetch_ohlc, selected_symbol, timeframe, data_version)
+        analytics_future = submit_fetch(fetch_analytics, selected_symbol, timeframe, window, data_version)
+        analytics = fetch_result(analytics_future)
+        ohlc_data = fetch_result(ohlc_future)
         
         if analytics and not analytics.get('message'):
             # Display key metrics
@@ -323,23 +468,19 @@ def main():
                 st.write(f"Is Stationary: {'✅ Yes' if adf_result.get('is_stationary') else '❌ No'}")
             
             # Plot price and z-score
-            ohlc_data = fetch_ohlc(selected_symbol, timeframe)
             if ohlc_data:
-                df = pd.DataFrame(ohlc_data)
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                df = df.set_index('timestamp')
+                df = ohlc_to_df(ohlc_data)
                 
                 zscores = analytics.get('zscore', [])
-                fig = plot_spread_and_zscore(df, zscores)
-                st.plotly_chart(fig, use_container_width=True)
+                fig = plot_spread_and_zscore(df, zscores, uirevision=selected_symbol)
+                st.plotly_chart(fig, use_container_width=True, theme=None, key="zscore_chart")
         else:
             st.info("Insufficient data for analytics. Collect more data first.")
     
-    with tab3:
+    elif active_view == views[2]:
         st.header(f"Statistics: {selected_symbol}")
         
-        # Fetch analytics
-        analytics = fetch_analytics(selected_symbol, timeframe, window)
+        analytics = fetch_result(submit_fetch(fetch_analytics, selected_symbol, timeframe, window, data_version))
         
         if analytics and not analytics.get('message'):
             # Plot statistics
@@ -355,27 +496,32 @@ def main():
         else:
             st.info("Collect data to see statistics.")
     
-    with tab4:
+    else:
         st.header("Settings & Configuration")
         
         # Alert configuration
         st.subheader("Alert Configuration")
-        condition = st.text_input("Alert Condition", placeholder="e.g., zscore > 2")
-        if st.button("Add Alert"):
+        # A form holds the condition in the browser until it is submitted, so
+        # editing it does not rerun the script
+        with st.form("alert_form"):
+            condition = st.text_input("Alert Condition", placeholder="e.g., zscore > 2")
+            submitted = st.form_submit_button("Add Alert")
+        if submitted:
             if condition:
-                response = requests.post(f"{API_URL}/add_alert", params={"condition": condition})
+                response = get_client().post("/add_alert", params={"condition": condition})
                 if response.status_code == 200:
                     st.success("Alert added successfully")
+                elif response.status_code == 400:
+                    st.error(f"Invalid alert condition: {response.json()['detail']}")
                 else:
                     st.error("Failed to add alert")
         
         # Export data
         st.subheader("Export Data")
         if st.button("Export to CSV"):
-            ohlc_data = fetch_ohlc(selected_symbol, timeframe)
+            ohlc_data = fetch_result(submit_fetch(fetch_ohlc, selected_symbol, timeframe, data_version))
             if ohlc_data:
-                df = pd.DataFrame(ohlc_data)
-                csv = df.to_csv(index=False)
+                csv = ohlc_to_df(ohlc_data).to_csv()
                 st.download_button(
                     label="Download CSV",
                     data=csv,
@@ -385,7 +531,8 @@ def main():
     
     # Auto-refresh logic
     if auto_refresh:
-        time.sleep(refresh_interval)
+        # Jitter keeps several open dashboards from hitting the API in lockstep
+        time.sleep(refresh_interval + random.uniform(0, 0.5))
         st.rerun()
 
 if __name__ == "__main__":
@@ -2,8 +2,12 @@
 Database models and connection management for tick data storage.
 """
 import sqlite3
+import threading
+import queue
+import numbers
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 import logging
 from pathlib import Path
 
@@ -11,221 +15,395 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def _to_epoch_ms(timestamp: Any) -> Optional[int]:
+    """
+    Coerce a timestamp to integer epoch milliseconds.
+    
+    Accepts epoch milliseconds (as a number or digit string), datetimes and ISO
+    strings. Naive values are taken as local time, which is how the old ISO
+    text columns were written. None passes through.
+    """
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, numbers.Real):
+        return int(timestamp)
+    if isinstance(timestamp, str):
+        if timestamp.isdigit():
+            return int(timestamp)
+        timestamp = datetime.fromisoformat(timestamp)
+    if isinstance(timestamp, datetime):
+        return round(timestamp.timestamp() * 1000)
+    raise TypeError(f"Unsupported timestamp: {timestamp!r}")
+
+
+_TICKS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS ticks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        symbol TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        price REAL NOT NULL,
+        size REAL NOT NULL,
+        event_time INTEGER,
+        trade_id INTEGER
+    )
+"""
+
+
 class TickDatabase:
     """SQLite database for storing tick data."""
     
+    # Seconds between background commits of staged single-row writes
+    COMMIT_INTERVAL = 0.1
+    # Read-only connections shared by the query methods
+    READ_POOL_SIZE = 8
+    
     def __init__(self, db_path: str = "data/ticks.db"):
         """Initialize database connection."""
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self.db_path = db_path
+        # Single writer connection; reads go through the read-only pool below
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        self._configure_connection()
         self._create_tables()
+        
+        self._read_pool = queue.Queue(maxsize=self.READ_POOL_SIZE)
+        for _ in range(self.READ_POOL_SIZE):
+            self._read_pool.put(self._open_reader())
+        
+        # The writer is shared across threads; writes and commits take this lock
+        self._write_lock = threading.RLock()
+        self._closed = threading.Event()
+        self._commit_thread = threading.Thread(target=self._commit_periodically, daemon=True)
+        self._commit_thread.start()
+    
+    def _configure_connection(self):
+        """Use WAL journaling so commits append to the log instead of fsyncing per row."""
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._tune_connection(self.conn)
+    
+    @staticmethod
+    def _tune_connection(conn: sqlite3.Connection):
+        """Cache and memory settings shared by writer and reader connections."""
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA cache_size=-65536")
+    
+    def _open_reader(self) -> sqlite3.Connection:
+        """Open a read-only connection; under WAL it never blocks the writer."""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        self._tune_connection(conn)
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """Borrow a pooled read-only connection, waiting if all are in use."""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
     
     def _create_tables(self):
         """Create necessary tables."""
         cursor = self.conn.cursor()
         
-        # Ticks table - raw tick data
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ticks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                symbol TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                price REAL NOT NULL,
-                size REAL NOT NULL,
-                event_time TEXT,
-                trade_id INTEGER
-            )
-        """)
+        # Ticks table - raw tick data, timestamps in epoch milliseconds
+        tick_columns = self._column_types(cursor, 'ticks')
+        if tick_columns.get('timestamp') == 'TEXT':
+            self._migrate_text_timestamps(cursor)
+        cursor.execute(_TICKS_SCHEMA)
+        
+        # OHLC bars are derived from ticks, so an old rowid-keyed or text-timestamp
+        # table is just rebuilt
+        ohlc_columns = self._column_types(cursor, 'ohlc')
+        if 'id' in ohlc_columns or ohlc_columns.get('timestamp') == 'TEXT':
+            cursor.execute("DROP TABLE ohlc")
         
-        # OHLC table - aggregated data
+        # OHLC table - aggregated data, clustered on its natural key
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS ohlc (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
                 symbol TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 open_price REAL,
                 high_price REAL,
                 low_price REAL,
                 close_price REAL,
                 volume REAL,
-                timeframe TEXT,
+                timeframe TEXT NOT NULL,
                 trade_count INTEGER,
-                UNIQUE(symbol, timestamp, timeframe)
-            )
+                PRIMARY KEY (symbol, timeframe, timestamp)
+            ) WITHOUT ROWID
         """)
         
-        # Indexes for faster queries
+        # OHLC rows under the column names the API and dashboard use
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_ticks_symbol_timestamp 
-            ON ticks(symbol, timestamp)
+            CREATE VIEW IF NOT EXISTS ohlc_v AS
+            SELECT symbol, timestamp, open_price AS open, high_price AS high,
+                   low_price AS low, close_price AS close, volume, timeframe,
+                   COALESCE(trade_count, 0) AS trade_count
+            FROM ohlc
         """)
         
+        # Covering index for the newest-first, (timestamp, id)-keyed tick reads in
+        # get_ticks; it supersedes the older tick indexes
+        cursor.execute("DROP INDEX IF EXISTS idx_ticks_symbol_timestamp")
+        cursor.execute("DROP INDEX IF EXISTS idx_ticks_cover")
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_ohlc_symbol_timestamp 
-            ON ohlc(symbol, timestamp, timeframe)
+            CREATE INDEX IF NOT EXISTS idx_ticks_keyset 
+            ON ticks(symbol, timestamp DESC, id DESC, price, size, event_time, trade_id)
         """)
         
         self.conn.commit()
         logger.info(f"Database initialized at {self.db_path}")
     
+    @staticmethod
+    def _column_types(cursor: sqlite3.Cursor, table: str) -> Dict[str, str]:
+        """Declared column types of a table; empty if it does not exist."""
+        return {row['name']: row['type'] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    
+    def _migrate_text_timestamps(self, cursor: sqlite3.Cursor):
+        """Rewrite a ticks table with ISO text timestamps to epoch milliseconds."""
+        logger.info("Migrating tick timestamps from ISO text to epoch milliseconds")
+        self.conn.create_function("to_epoch_ms", 1, _to_epoch_ms, deterministic=True)
+        cursor.execute("ALTER TABLE ticks RENAME TO ticks_text")
+        cursor.execute(_TICKS_SCHEMA)
+        cursor.execute("""
+            INSERT INTO ticks (id, symbol, timestamp, price, size, event_time, trade_id)
+            SELECT id, symbol, to_epoch_ms(timestamp), price, size, to_epoch_ms(event_time), trade_id
+            FROM ticks_text
+        """)
+        cursor.execute("DROP TABLE ticks_text")
+    
+    def _commit_periodically(self):
+        """Commit staged single-row writes every COMMIT_INTERVAL seconds."""
+        while not self._closed.wait(self.COMMIT_INTERVAL):
+            self.flush()
+    
+    def flush(self) -> None:
+        """Commit any writes staged by insert_tick/insert_ohlc."""
+        with self._write_lock:
+            if not self.conn.in_transaction:
+                return
+            try:
+                self.conn.commit()
+            except Exception as e:
+                logger.error(f"Error committing staged writes: {e}")
+                self.conn.rollback()
+    
     def insert_tick(self, tick_data: Dict[str, Any]) -> None:
-        """Insert a tick into the database."""
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO ticks (symbol, timestamp, price, size, event_time, trade_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                tick_data['symbol'],
-                tick_data['timestamp'],
-                tick_data['price'],
-                tick_data['size'],
-                tick_data.get('event_time'),
-                tick_data.get('trade_id')
-            ))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Error inserting tick: {e}")
-            self.conn.rollback()
+        """Stage a tick insert; it is committed by the next flush."""
+        with self._write_lock:
+            try:
+                self.conn.execute("""
+                    INSERT INTO ticks (symbol, timestamp, price, size, event_time, trade_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    tick_data['symbol'],
+                    _to_epoch_ms(tick_data['timestamp']),
+                    tick_data['price'],
+                    tick_data['size'],
+                    _to_epoch_ms(tick_data.get('event_time')),
+                    tick_data.get('trade_id')
+                ))
+            except Exception as e:
+                logger.error(f"Error inserting tick: {e}")
     
     def insert_ticks_batch(self, ticks: List[Dict[str, Any]]) -> None:
         """Insert multiple ticks in batch for efficiency."""
-        cursor = self.conn.cursor()
         try:
-            cursor.executemany("""
-                INSERT INTO ticks (symbol, timestamp, price, size, event_time, trade_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, [
-                (
-                    tick['symbol'],
-                    tick['timestamp'],
-                    tick['price'],
-                    tick['size'],
-                    tick.get('event_time'),
-                    tick.get('trade_id')
-                )
-                for tick in ticks
-            ])
-            self.conn.commit()
+            with self._write_lock, self.conn:
+                self.conn.executemany("""
+                    INSERT INTO ticks (symbol, timestamp, price, size, event_time, trade_id)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        tick['symbol'],
+                        _to_epoch_ms(tick['timestamp']),
+                        tick['price'],
+                        tick['size'],
+                        _to_epoch_ms(tick.get('event_time')),
+                        tick.get('trade_id')
+                    )
+                    for tick in ticks
+                ])
         except Exception as e:
             logger.error(f"Error inserting ticks batch: {e}")
-            self.conn.rollback()
     
     def insert_ohlc(self, ohlc_data: Dict[str, Any]) -> None:
-        """Insert OHLC data."""
-        cursor = self.conn.cursor()
+        """Stage an OHLC insert; it is committed by the next flush."""
+        with self._write_lock:
+            try:
+                self.conn.execute("""
+                    INSERT OR REPLACE INTO ohlc 
+                    (symbol, timestamp, open_price, high_price, low_price, close_price, 
+                     volume, timeframe, trade_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    ohlc_data['symbol'],
+                    _to_epoch_ms(ohlc_data['timestamp']),
+                    ohlc_data['open'],
+                    ohlc_data['high'],
+                    ohlc_data['low'],
+                    ohlc_data['close'],
+                    ohlc_data['volume'],
+                    ohlc_data['timeframe'],
+                    ohlc_data.get('trade_count', 0)
+                ))
+            except Exception as e:
+                logger.error(f"Error inserting OHLC: {e}")
+    
+    def insert_ohlc_batch(self, ohlc_rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert or update multiple OHLC bars in a single transaction.
+        
+        Rows are bound through executemany's prepared statement; handing SQLite
+        the batch as JSON to unpack with json_each measured several times slower.
+        Bars identical to the stored ones are left untouched.
+        
+        Returns:
+            Number of bars that were new or changed
+        """
+        if not ohlc_rows:
+            return 0
         try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO ohlc 
-                (symbol, timestamp, open_price, high_price, low_price, close_price, 
-                 volume, timeframe, trade_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ohlc_data['symbol'],
-                ohlc_data['timestamp'],
-                ohlc_data['open'],
-                ohlc_data['high'],
-                ohlc_data['low'],
-                ohlc_data['close'],
-                ohlc_data['volume'],
-                ohlc_data['timeframe'],
-                ohlc_data.get('trade_count', 0)
-            ))
-            self.conn.commit()
+            with self._write_lock, self.conn:
+                changes_before = self.conn.total_changes
+                self.conn.executemany("""
+                    INSERT INTO ohlc 
+                    (symbol, timestamp, open_price, high_price, low_price, close_price, 
+                     volume, timeframe, trade_count)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, timeframe, timestamp) DO UPDATE SET
+                        open_price = excluded.open_price,
+                        high_price = excluded.high_price,
+                        low_price = excluded.low_price,
+                        close_price = excluded.close_price,
+                        volume = excluded.volume,
+                        trade_count = excluded.trade_count
+                    WHERE (open_price, high_price, low_price, close_price, volume, trade_count)
+                        IS NOT (excluded.open_price, excluded.high_price, excluded.low_price,
+                                excluded.close_price, excluded.volume, excluded.trade_count)
+                """, (
+                    (
+                        row['symbol'],
+                        _to_epoch_ms(row['timestamp']),
+                        row['open'],
+                        row['high'],
+                        row['low'],
+                        row['close'],
+                        row['volume'],
+                        row['timeframe'],
+                        row.get('trade_count', 0)
+                    )
+                    for row in ohlc_rows
+                ))
+                return self.conn.total_changes - changes_before
         except Exception as e:
-            logger.error(f"Error inserting OHLC: {e}")
-            self.conn.rollback()
+            logger.error(f"Error inserting OHLC batch: {e}")
+            return 0
     
     def get_ticks(
         self, 
         symbol: str, 
-        start_time: Optional[str] = None,
-        end_time: Optional[str] = None,
-        limit: Optional[int] = None
+        start_time: Optional[Union[int, str]] = None,
+        end_time: Optional[Union[int, str]] = None,
+        limit: Optional[int] = None,
+        before: Optional[Union[int, str]] = None,
+        before_id: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Get ticks for a symbol within a time range."""
-        cursor = self.conn.cursor()
-        query = "SELECT * FROM ticks WHERE symbol = ?"
+        """
+        Get ticks for a symbol within a time range, newest first.
+        
+        Times may be given as epoch milliseconds or ISO strings; returned
+        timestamps are epoch milliseconds.
+        
+        Pass the oldest tick of the previous page's timestamp and id as before and
+        before_id to fetch the next page without rescanning the rows already
+        returned. Several trades can share a millisecond, so the id is needed to
+        resume inside one; before alone returns only strictly older ticks.
+        """
+        # Only columns in idx_ticks_keyset (id is the rowid), so no table lookups
+        query = """
+            SELECT id, symbol, timestamp, price, size, event_time, trade_id
+            FROM ticks WHERE symbol = ?
+        """
         params = [symbol]
         
         if start_time:
             query += " AND timestamp >= ?"
-            params.append(start_time)
+            params.append(_to_epoch_ms(start_time))
         
         if end_time:
             query += " AND timestamp <= ?"
-            params.append(end_time)
+            params.append(_to_epoch_ms(end_time))
         
-        query += " ORDER BY timestamp DESC"
+        if before and before_id is not None:
+            query += " AND (timestamp, id) < (?, ?)"
+            params.extend([_to_epoch_ms(before), before_id])
+        elif before:
+            query += " AND timestamp < ?"
+            params.append(_to_epoch_ms(before))
+        
+        query += " ORDER BY timestamp DESC, id DESC"
         
         if limit:
             query += " LIMIT ?"
             params.append(limit)
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        with self._reader() as conn:
+            rows = conn.execute(query, params).fetchall()
         return [dict(row) for row in rows]
     
     def get_ohlc(
         self,
         symbol: str,
         timeframe: str,
-        start_time: Optional[str] = None,
-        end_time: Optional[str] = None
+        start_time: Optional[Union[int, str]] = None,
+        end_time: Optional[Union[int, str]] = None
     ) -> List[Dict[str, Any]]:
         """Get OHLC data for a symbol and timeframe."""
-        cursor = self.conn.cursor()
         query = """
-            SELECT * FROM ohlc 
+            SELECT * FROM ohlc_v 
             WHERE symbol = ? AND timeframe = ?
         """
         params = [symbol, timeframe]
         
         if start_time:
             query += " AND timestamp >= ?"
-            params.append(start_time)
+            params.append(_to_epoch_ms(start_time))
         
         if end_time:
             query += " AND timestamp <= ?"
-            params.append(end_time)
+            params.append(_to_epoch_ms(end_time))
         
         query += " ORDER BY timestamp"
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        # Convert to dict with correct column names
-        result = []
-        for row in rows:
-            result.append({
-                'symbol': row['symbol'],
-                'timestamp': row['timestamp'],
-                'open': row['open_price'],
-                'high': row['high_price'],
-                'low': row['low_price'],
-                'close': row['close_price'],
-                'volume': row['volume'],
-                'timeframe': row['timeframe'],
-                'trade_count': row.get('trade_count', 0)
-            })
-        return result
+        with self._reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
     
     def get_symbols(self) -> List[str]:
         """Get all unique symbols."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT symbol FROM ticks")
-        return [row[0] for row in cursor.fetchall()]
+        with self._reader() as conn:
+            rows = conn.execute("SELECT DISTINCT symbol FROM ticks").fetchall()
+        return [row[0] for row in rows]
     
     def get_tick_count(self, symbol: str) -> int:
         """Get total tick count for a symbol."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM ticks WHERE symbol = ?", (symbol,))
-        return cursor.fetchone()[0]
+        with self._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ticks WHERE symbol = ?", (symbol,)).fetchone()[0]
     
     def close(self):
-        """Close database connection."""
+        """Commit staged writes and close all database connections."""
+        self._closed.set()
+        self._commit_thread.join()
+        while not self._read_pool.empty():
+            self._read_pool.get_nowait().close()
         if self.conn:
+            self.flush()
             self.conn.close()
 
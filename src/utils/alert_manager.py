@@ -1,13 +1,277 @@
 """
 Alert management system for monitoring conditions on real-time data.
 """
-from typing import List, Dict, Callable, Any
+from typing import List, Dict, Callable, Any, Optional, Tuple
+from collections import deque
+from itertools import islice
 from datetime import datetime
+import ast
+import operator
 import logging
+import numpy as np
+import pandas as pd
+
+try:
+    import numexpr
+except ImportError:  # batch evaluation falls back to DataFrame.eval
+    numexpr = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Operators an alert condition may use
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+_COMPARE_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+# The same operators spelled for NumExpr, which has no and/or/not or chained comparisons
+_NUMEXPR_SYMBOLS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/',
+    ast.USub: '-', ast.UAdd: '+',
+    ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!=',
+}
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+def _lookup_op(table: Dict[type, Callable], op: ast.AST) -> Callable:
+    """Map an AST operator node to its function, rejecting anything not whitelisted."""
+    try:
+        return table[type(op)]
+    except KeyError:
+        raise ValueError(f"Unsupported operator in alert condition: {type(op).__name__}") from None
+
+
+def _compile_name(node: ast.Name) -> Evaluator:
+    name = node.id
+    return lambda context: context[name]
+
+
+def _compile_constant(node: ast.Constant) -> Evaluator:
+    if not isinstance(node.value, (int, float)):
+        raise ValueError(f"Unsupported constant in alert condition: {node.value!r}")
+    value = node.value
+    return lambda context: value
+
+
+def _compile_unary(node: ast.UnaryOp) -> Evaluator:
+    op = _lookup_op(_UNARY_OPS, node.op)
+    operand = _compile_node(node.operand)
+    return lambda context: op(operand(context))
+
+
+def _compile_binary(node: ast.BinOp) -> Evaluator:
+    op = _lookup_op(_BINARY_OPS, node.op)
+    left, right = _compile_node(node.left), _compile_node(node.right)
+    return lambda context: op(left(context), right(context))
+
+
+def _compile_bool(node: ast.BoolOp) -> Evaluator:
+    values = [_compile_node(value) for value in node.values]
+    if isinstance(node.op, ast.And):
+        return lambda context: all(value(context) for value in values)
+    return lambda context: any(value(context) for value in values)
+
+
+def _compile_compare(node: ast.Compare) -> Evaluator:
+    left = _compile_node(node.left)
+    steps = [
+        (_lookup_op(_COMPARE_OPS, op), _compile_node(comparator))
+        for op, comparator in zip(node.ops, node.comparators)
+    ]
+    
+    def compare(context):
+        # Chained comparisons (a < b < c) hold only if every link holds
+        lhs = left(context)
+        for op, comparator in steps:
+            rhs = comparator(context)
+            if not op(lhs, rhs):
+                return False
+            lhs = rhs
+        return True
+    
+    return compare
+
+
+_NODE_COMPILERS = {
+    ast.Name: _compile_name,
+    ast.Constant: _compile_constant,
+    ast.UnaryOp: _compile_unary,
+    ast.BinOp: _compile_binary,
+    ast.BoolOp: _compile_bool,
+    ast.Compare: _compile_compare,
+}
+
+
+def _compile_node(node: ast.AST) -> Evaluator:
+    """Compile one AST node to a closure over the evaluation context."""
+    compiler = _NODE_COMPILERS.get(type(node))
+    if compiler is None:
+        raise ValueError(f"Unsupported expression in alert condition: {type(node).__name__}")
+    return compiler(node)
+
+
+def _parse_condition(condition: str) -> ast.AST:
+    """Parse a condition to the body of its expression AST, raising ValueError on bad syntax."""
+    try:
+        return ast.parse(condition, mode="eval").body
+    except SyntaxError as e:
+        raise ValueError(f"Invalid alert condition {condition!r}: {e.msg}")
+
+
+def compile_condition(condition: str) -> Evaluator:
+    """
+    Compile an alert condition into a function of the evaluation context.
+    
+    Only variable names, numeric constants, arithmetic (+ - * /), comparisons,
+    and/or/not are accepted, so conditions cannot run arbitrary code.
+    
+    Args:
+        condition: Condition string (e.g., 'zscore > 2 and volume > 100')
+    
+    Returns:
+        Function taking the context dict and returning the condition's value
+    
+    Raises:
+        ValueError: If the condition is not valid or uses unsupported syntax
+    """
+    return _compile_node(_parse_condition(condition))
+
+
+def _is_boolean(node: ast.AST) -> bool:
+    return (isinstance(node, (ast.Compare, ast.BoolOp))
+            or (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not)))
+
+
+def _negate(source: str) -> str:
+    # Not ~: NumExpr folds constant comparisons to Python bools, and ~True is -2
+    return f"({source} == False)"
+
+
+def _any_error(errors: List[Optional[str]]) -> Optional[str]:
+    """Join error-mask sources with |; None when nothing can fail."""
+    errors = [error for error in errors if error]
+    return f"({' | '.join(errors)})" if errors else None
+
+
+def _short_circuit_error(guards: List[str], errors: List[Optional[str]]) -> Optional[str]:
+    """Error mask for operands evaluated left to right, operand i only where guards[:i] all hold."""
+    terms = [
+        " & ".join([*guards[:i], error]) if i else error
+        for i, error in enumerate(errors) if error
+    ]
+    return _any_error([f"({term})" for term in terms])
+
+
+def _numexpr_test(node: ast.AST) -> Tuple[str, Optional[str]]:
+    """Like _numexpr_parts, for node used as a truth value, as and/or/not operands are."""
+    source, error = _numexpr_parts(node)
+    return (source if _is_boolean(node) else f"({source} != 0)"), error
+
+
+def _numexpr_operand(node: ast.AST) -> Tuple[str, Optional[str]]:
+    """Like _numexpr_parts, for node used as a number."""
+    # and/or yield an operand's value and comparisons yield bools, neither of
+    # which the boolean masks below reproduce
+    if _is_boolean(node):
+        raise ValueError("boolean subexpressions used as numbers are not vectorized")
+    return _numexpr_parts(node)
+
+
+def _numexpr_parts(node: ast.AST) -> Tuple[str, Optional[str]]:
+    """
+    Rewrite a whitelisted condition AST as NumExpr source.
+    
+    Returns the value source plus the source of a mask of rows where the
+    per-row evaluator would raise (a zero divisor it actually reaches), or
+    None when the expression cannot fail. NumExpr itself yields inf/nan there.
+    """
+    if isinstance(node, ast.Name):
+        return node.id, None
+    if isinstance(node, ast.Constant):
+        return repr(node.value), None
+    if isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            source, error = _numexpr_test(node.operand)
+            return _negate(source), error
+        source, error = _numexpr_operand(node.operand)
+        return f"({_NUMEXPR_SYMBOLS[type(node.op)]}{source})", error
+    if isinstance(node, ast.BinOp):
+        (left, left_error), (right, right_error) = _numexpr_operand(node.left), _numexpr_operand(node.right)
+        errors = [left_error, right_error]
+        if isinstance(node.op, ast.Div):
+            errors.append(f"({right} == 0)")
+        return f"({left} {_NUMEXPR_SYMBOLS[type(node.op)]} {right})", _any_error(errors)
+    if isinstance(node, ast.BoolOp):
+        tests, errors = zip(*(_numexpr_test(value) for value in node.values))
+        # and reaches an operand only past truthy ones, or only past falsy ones
+        if isinstance(node.op, ast.And):
+            return f"({' & '.join(tests)})", _short_circuit_error(list(tests), list(errors))
+        guards = [_negate(test) for test in tests]
+        return f"({' | '.join(tests)})", _short_circuit_error(guards, list(errors))
+    # Compare: a < b < c becomes (a < b) & (b < c); c is only evaluated where a < b
+    operands = [_numexpr_operand(operand) for operand in [node.left, *node.comparators]]
+    links = [
+        f"({lhs} {_NUMEXPR_SYMBOLS[type(op)]} {rhs})"
+        for op, (lhs, _), (rhs, _) in zip(node.ops, operands, operands[1:])
+    ]
+    left_error = operands[0][1]
+    error = _short_circuit_error(links, [error for _, error in operands[1:]])
+    return f"({' & '.join(links)})", _any_error([left_error, error])
+
+
+def _numexpr_source(node: ast.AST) -> str:
+    """NumExpr source for a condition's truth value, False wherever evaluation would raise."""
+    source, error = _numexpr_test(node)
+    return f"({source} & {_negate(error)})" if error else source
+
+
+def _vectorized_source(tree: ast.AST) -> Optional[str]:
+    """Column-wise source for a whitelisted condition AST, or None if it cannot be vectorized."""
+    try:
+        return _numexpr_source(tree)
+    except ValueError:
+        return None
+
+
+def compile_numexpr(source: str, names: List[str]):
+    """
+    Precompile column-wise condition source into a NumExpr program over float64 columns.
+    
+    The program's input_names list the columns it takes, in call order.
+    
+    Args:
+        source: Source built from a whitelisted condition by _vectorized_source
+        names: Variable names the source uses
+    
+    Returns:
+        numexpr.NumExpr program, or None if NumExpr is not installed or
+        cannot compile the source
+    """
+    if numexpr is None:
+        return None
+    try:
+        return numexpr.NumExpr(source, signature=[(name, np.float64) for name in names])
+    except Exception as e:
+        logger.info(f"Alert condition {source!r} not precompiled for NumExpr: {e}")
+        return None
+
 
 class Alert:
     """Represents a single alert rule."""
@@ -19,8 +283,20 @@ class Alert:
         Args:
             condition: Condition string (e.g., 'zscore > 2', 'price > 50000')
             callback: Function to call when alert triggers
+        
+        Raises:
+            ValueError: If the condition cannot be compiled
         """
         self.condition = condition
+        # Parse once; the per-row evaluator, the column-wise source and the
+        # NumExpr program are all built from the same whitelisted tree
+        tree = _parse_condition(condition)
+        self._evaluator = _compile_node(tree)
+        self._batch_source = _vectorized_source(tree)
+        self._nex = None
+        if self._batch_source is not None:
+            names = list(dict.fromkeys(node.id for node in ast.walk(tree) if isinstance(node, ast.Name)))
+            self._nex = compile_numexpr(self._batch_source, names)
         self.callback = callback
         self.triggered = False
         self.triggered_at = None
@@ -37,14 +313,42 @@ class Alert:
             True if alert should trigger
         """
         try:
-            # Simple evaluation using eval (in production, use a proper expression parser)
-            # This is a simplified version - in production, use AST parsing
-            result = eval(self.condition, {"__builtins__": {}, **context})
-            return bool(result)
+            return bool(self._evaluator(context))
         except Exception as e:
             logger.error(f"Error evaluating alert condition: {e}")
             return False
     
+    def evaluate_vec(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Evaluate the condition over every row of df at once.
+        
+        Uses the precompiled NumExpr program when there is one, else df.eval,
+        else evaluate on each row. Every path matches evaluate row by row: rows
+        where evaluate would raise, such as 'volume / zscore > 10' with
+        zscore == 0, are False.
+        
+        Args:
+            df: DataFrame whose columns are the condition variables
+        
+        Returns:
+            Boolean mask with one entry per row
+        """
+        mask = None
+        if self._nex is not None:
+            mask = self._nex(*(df[name].to_numpy(dtype=np.float64) for name in self._nex.input_names))
+        elif self._batch_source is not None:
+            try:
+                # pandas also turns zero divisors into inf/nan, so evaluate the
+                # same guarded source rather than the raw condition
+                mask = df.eval(self._batch_source)
+            except (ArithmeticError, TypeError):
+                # pandas folds column-free parts itself, where e.g. 1 / 0 raises;
+                # leave those to the per-row path
+                pass
+        if mask is None:
+            mask = [self.evaluate(row) for row in df.to_dict('records')]
+        return np.broadcast_to(np.asarray(mask, dtype=bool), len(df))
+    
     def trigger(self, data: Dict[str, Any]):
         """Trigger the alert."""
         self.triggered = True
@@ -60,9 +364,13 @@ class Alert:
 class AlertManager:
     """Manages multiple alert rules."""
     
+    # Number of triggered alerts kept in the history
+    MAX_HISTORY = 1000
+    
     def __init__(self):
-        self.alerts: List[Alert] = []
-        self.alert_history: List[Dict[str, Any]] = []
+        # Keyed by condition; adding an existing condition replaces its alert
+        self.alerts: Dict[str, Alert] = {}
+        self.alert_history: deque = deque(maxlen=self.MAX_HISTORY)
     
     def add_alert(self, condition: str, callback: Callable = None) -> Alert:
         """
@@ -74,15 +382,18 @@ class AlertManager:
         
         Returns:
             Created Alert object
+        
+        Raises:
+            ValueError: If the condition cannot be compiled
         """
         alert = Alert(condition, callback)
-        self.alerts.append(alert)
+        self.alerts[condition] = alert
         logger.info(f"Added alert: {condition}")
         return alert
     
     def remove_alert(self, condition: str):
         """Remove an alert rule."""
-        self.alerts = [a for a in self.alerts if a.condition != condition]
+        self.alerts.pop(condition, None)
         logger.info(f"Removed alert: {condition}")
     
     def evaluate_alerts(self, context: Dict[str, Any]):
@@ -92,7 +403,7 @@ class AlertManager:
         Args:
             context: Dictionary containing variables for condition evaluation
         """
-        for alert in self.alerts:
+        for alert in self.alerts.values():
             try:
                 if alert.evaluate(context):
                     if not alert.triggered:
@@ -101,22 +412,47 @@ class AlertManager:
             except Exception as e:
                 logger.error(f"Error evaluating alert {alert.condition}: {e}")
     
+    def evaluate_batch(self, df: pd.DataFrame):
+        """
+        Evaluate all alerts against a batch of contexts, one row per tick.
+        
+        Each condition is evaluated over whole columns in one pass (see
+        Alert.evaluate_vec) instead of once per row. An alert triggers on the first row that
+        satisfies it, with that row as its context.
+        
+        Args:
+            df: DataFrame whose columns are the condition variables
+        """
+        if df.empty:
+            return
+        
+        for alert in self.alerts.values():
+            if alert.triggered:
+                continue
+            try:
+                hits = np.flatnonzero(alert.evaluate_vec(df))
+                if len(hits):
+                    context = df.iloc[hits[0]].to_dict()
+                    alert.trigger(context)
+                    self._record_alert(alert, context)
+            except Exception as e:
+                logger.error(f"Error evaluating alert {alert.condition}: {e}")
+    
     def _record_alert(self, alert: Alert, data: Dict[str, Any]):
-        """Record alert in history."""
+        """Record alert in history; the deque drops the oldest entry once full."""
         self.alert_history.append({
             'condition': alert.condition,
             'triggered_at': alert.triggered_at,
             'trigger_count': alert.trigger_count,
             'context': data
         })
-        
-        # Keep only last 1000 alerts
-        if len(self.alert_history) > 1000:
-            self.alert_history = self.alert_history[-1000:]
     
     def get_alert_history(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get alert history."""
-        return self.alert_history[-limit:]
+        """Get the most recent alert history entries, oldest first."""
+        # Walk back from the newest entry so only limit items are visited
+        recent = list(islice(reversed(self.alert_history), limit))
+        recent.reverse()
+        return recent
     
     def get_alerts(self) -> List[Dict[str, Any]]:
         """Get all active alerts with their status."""
@@ -127,7 +463,7 @@ class AlertManager:
                 'triggered_at': alert.triggered_at,
                 'trigger_count': alert.trigger_count
             }
-            for alert in self.alerts
+            for alert in self.alerts.values()
         ]
 
 
@@ -7,6 +7,27 @@ import webbrowser
 from pathlib import Path
 import time
 
+from src.backend.server import is_api_running
+
+def wait_for_api(backend: subprocess.Popen, timeout: float = 30.0) -> bool:
+    """
+    Poll until the API accepts TCP connections on port 8000.
+    
+    uvicorn only binds its socket once application startup has finished, so an
+    accepted connection means the API is ready. Retries back off from 50 ms to
+    1 s; gives up at the deadline or as soon as the backend process exits.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if backend.poll() is not None:
+            return False
+        if is_api_running():
+            return True
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 1.0)
+    return False
+
 def main():
     print("=" * 60)
     print("Quant Analytics Dashboard - Starting")
@@ -16,14 +37,18 @@ def main():
     print("[1/2] Starting Backend API...")
     backend = subprocess.Popen(
         [sys.executable, "-m", "uvicorn", "src.backend.api:app", 
-         "--host", "127.0.0.1", "--port", "8000"],
+         "--host", "127.0.0.1", "--port", "8000", "--no-access-log"],
         creationflags=subprocess.CREATE_NEW_CONSOLE if sys.platform == 'win32' else 0
     )
     
-    # Wait a bit for backend to start
-    for i in range(5):
-        time.sleep(1)
-        print(f"  Waiting for API... ({i+1}/5)")
+    # Wait until the backend is actually accepting connections
+    print("  Waiting for API...")
+    started = time.monotonic()
+    if not wait_for_api(backend):
+        print("  API failed to start; check the backend output above.")
+        backend.terminate()
+        sys.exit(1)
+    print(f"  API ready in {time.monotonic() - started:.1f}s")
     
     print("\n[2/2] Starting Streamlit Frontend...")
     print("\nDashboard will open at: http://localhost:8501")